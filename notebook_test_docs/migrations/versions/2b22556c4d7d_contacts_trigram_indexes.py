@@ -0,0 +1,34 @@
+"""Contacts trigram indexes
+
+Revision ID: 2b22556c4d7d
+Revises: 88e005d79f62
+Create Date: 2026-10-15 10:41:07.815230
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2b22556c4d7d'
+down_revision: Union[str, None] = '88e005d79f62'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.create_index('ix_contacts_email_trgm', 'contacts', ['email'], unique=False,
+                    postgresql_using='gin', postgresql_ops={'email': 'gin_trgm_ops'})
+    op.create_index('ix_contacts_first_name_trgm', 'contacts', ['first_name'], unique=False,
+                    postgresql_using='gin', postgresql_ops={'first_name': 'gin_trgm_ops'})
+    op.create_index('ix_contacts_last_name_trgm', 'contacts', ['last_name'], unique=False,
+                    postgresql_using='gin', postgresql_ops={'last_name': 'gin_trgm_ops'})
+
+
+def downgrade() -> None:
+    op.drop_index('ix_contacts_last_name_trgm', table_name='contacts')
+    op.drop_index('ix_contacts_first_name_trgm', table_name='contacts')
+    op.drop_index('ix_contacts_email_trgm', table_name='contacts')
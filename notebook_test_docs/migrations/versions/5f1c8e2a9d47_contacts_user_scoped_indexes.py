@@ -0,0 +1,28 @@
+"""Contacts user scoped indexes
+
+Revision ID: 5f1c8e2a9d47
+Revises: 2b22556c4d7d
+Create Date: 2026-10-15 11:20:44.508193
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5f1c8e2a9d47'
+down_revision: Union[str, None] = '2b22556c4d7d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_contacts_user_email', 'contacts', ['user_id', 'email'], unique=False)
+    op.create_index('ix_contacts_user_id_pk', 'contacts', ['user_id', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_contacts_user_id_pk', table_name='contacts')
+    op.drop_index('ix_contacts_user_email', table_name='contacts')
@@ -0,0 +1,38 @@
+"""Contacts user birth MMDD index
+
+Revision ID: 7e2b4f6a1c93
+Revises: c3a7d91e4b05
+Create Date: 2026-10-15 12:17:52.190447
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7e2b4f6a1c93'
+down_revision: Union[str, None] = 'c3a7d91e4b05'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        'ix_contacts_user_birth_mmdd',
+        'contacts',
+        [sa.text('user_id'), sa.text('(EXTRACT(month FROM birth_date) * 100 + EXTRACT(day FROM birth_date))')],
+        unique=False,
+    )
+    op.drop_index('ix_contacts_birth_mmdd', table_name='contacts')
+
+
+def downgrade() -> None:
+    op.create_index(
+        'ix_contacts_birth_mmdd',
+        'contacts',
+        [sa.text('(EXTRACT(month FROM birth_date) * 100 + EXTRACT(day FROM birth_date))')],
+        unique=False,
+    )
+    op.drop_index('ix_contacts_user_birth_mmdd', table_name='contacts')
@@ -0,0 +1,31 @@
+"""Contacts birth MMDD index
+
+Revision ID: 88e005d79f62
+Revises: 9ca5ed24dd8f
+Create Date: 2026-10-15 10:12:31.274018
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '88e005d79f62'
+down_revision: Union[str, None] = '9ca5ed24dd8f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        'ix_contacts_birth_mmdd',
+        'contacts',
+        [sa.text('(EXTRACT(month FROM birth_date) * 100 + EXTRACT(day FROM birth_date))')],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_contacts_birth_mmdd', table_name='contacts')
@@ -0,0 +1,30 @@
+"""Contacts owner email unique
+
+Revision ID: c3a7d91e4b05
+Revises: 5f1c8e2a9d47
+Create Date: 2026-10-15 12:02:18.733610
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3a7d91e4b05'
+down_revision: Union[str, None] = '5f1c8e2a9d47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_unique_constraint('uq_contacts_owner_email', 'contacts', ['user_id', 'email'])
+    op.drop_index('ix_contacts_user_email', table_name='contacts')
+    op.drop_index('ix_contacts_email', table_name='contacts')
+
+
+def downgrade() -> None:
+    op.create_index('ix_contacts_email', 'contacts', ['email'], unique=True)
+    op.create_index('ix_contacts_user_email', 'contacts', ['user_id', 'email'], unique=False)
+    op.drop_constraint('uq_contacts_owner_email', 'contacts', type_='unique')
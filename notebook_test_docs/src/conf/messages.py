@@ -2,3 +2,10 @@ ACCOUNT_EXISTS_EXCEPTION = 'Account already exists'
 EMAIL_NOT_CONFIRMED = 'Email not confirmed'
 INVALID_PASSWORD = 'Invalid password'
 INVALID_EMAIL = 'Invalid email'
+CONTACT_EXISTS = 'Email already registered'
+NOT_FOUND = 'Not found'
+COULD_NOT_VALIDATE_CREDENTIALS = 'Could not validate credentials'
+INVALID_SCOPE = 'Invalid scope for token'
+INVALID_REFRESH_TOKEN = 'Invalid refresh token'
+INVALID_EMAIL_TOKEN = 'Invalid token for email verification'
+VERIFICATION_ERROR = 'Verification error'
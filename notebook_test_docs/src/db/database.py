@@ -1,28 +1,39 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+import redis.asyncio as redis
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import declarative_base
 
 
-from src.conf.config import settings
+from src.conf.config import get_settings
 
+settings = get_settings()
 
 SQLALCHEMY_DATABASE_URL = settings.sqlalchemy_database_url
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+engine = create_async_engine(
+    SQLALCHEMY_DATABASE_URL,
+    pool_size=settings.db_pool_size,
+    max_overflow=settings.db_max_overflow,
+    pool_recycle=settings.db_pool_recycle,
+    pool_pre_ping=settings.db_pool_pre_ping,
+    # reuse the most recently returned connection, so idle ones can be recycled
+    pool_use_lifo=True,
+)
+SessionLocal = async_sessionmaker(
+    engine, autoflush=False, expire_on_commit=False
+)
 
 Base = declarative_base()
 
+redis_client = redis.Redis(host=settings.redis_host, port=settings.redis_port, db=0)
+
 
 # Dependency
-def get_db():
+async def get_db():
     """
     The get_db function is a context manager that returns the database session.
     It also ensures that the connection to the database is closed after each request.
 
     :return: A database session, which is used to query the database
     :doc-author: Trelent"""
-    db = SessionLocal()
-    try:
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
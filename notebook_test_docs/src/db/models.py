@@ -1,9 +1,18 @@
-from sqlalchemy import Column, Integer, String, DateTime, func, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, func, ForeignKey, Boolean, Index, UniqueConstraint, extract, \
+    literal_column
 from sqlalchemy.orm import relationship
 
 from src.db.database import Base
 
 
+def month_day(column):
+    """
+    Build the MMDD number (e.g. 1017 for 17 October) of a date column.
+    The same expression backs ix_contacts_user_birth_mmdd, so queries using it can be served by the index.
+    """
+    return extract("month", column) * literal_column("100") + extract("day", column)
+
+
 class User(Base):
     __tablename__ = "users"
 
@@ -15,7 +24,7 @@ class User(Base):
     refresh_token = Column(String(255), nullable=True)
     confirmed = Column(Boolean, default=False)
 
-    contacts = relationship("Contact", back_populates="owner", cascade="all, delete")
+    contacts = relationship("Contact", back_populates="owner", cascade="all, delete", lazy="raise")
 
 
 class Contact(Base):
@@ -24,11 +33,38 @@ class Contact(Base):
     id = Column(Integer, primary_key=True, index=True)
     first_name = Column(String(50), nullable=False)
     last_name = Column(String(50), nullable=False)
-    email = Column(String, nullable=False, unique=True, index=True)
+    email = Column(String, nullable=False)
     phone = Column(String, nullable=True, index=True)
     birth_date = Column(DateTime, nullable=True)
     bio = Column(String, nullable=True)
     user_id = Column(Integer, ForeignKey("users.id"))
     created_at = Column("created_at", DateTime, default=func.now())
 
-    owner = relationship("User", back_populates="contacts")
+    owner = relationship("User", back_populates="contacts", lazy="joined")
+
+    __table_args__ = (
+        # every contact query is scoped to the owner, so user_id leads;
+        # the unique constraint also serves the (user_id, email) lookups
+        UniqueConstraint("user_id", "email", name="uq_contacts_owner_email"),
+        Index("ix_contacts_user_id_pk", "user_id", "id"),
+        Index("ix_contacts_user_birth_mmdd", "user_id", month_day(birth_date)),
+        # trigram indexes serve the ILIKE '%...%' searches in get_contacts
+        Index(
+            "ix_contacts_email_trgm",
+            "email",
+            postgresql_using="gin",
+            postgresql_ops={"email": "gin_trgm_ops"},
+        ).ddl_if(dialect="postgresql"),
+        Index(
+            "ix_contacts_first_name_trgm",
+            "first_name",
+            postgresql_using="gin",
+            postgresql_ops={"first_name": "gin_trgm_ops"},
+        ).ddl_if(dialect="postgresql"),
+        Index(
+            "ix_contacts_last_name_trgm",
+            "last_name",
+            postgresql_using="gin",
+            postgresql_ops={"last_name": "gin_trgm_ops"},
+        ).ddl_if(dialect="postgresql"),
+    )
@@ -1,45 +1,65 @@
-from datetime import datetime, timedelta
+from datetime import date, timedelta
 
 from pydantic import EmailStr
-from sqlalchemy import and_
-from sqlalchemy.orm import Session
+from sqlalchemy import and_, delete, or_, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import noload
+from sqlalchemy.orm.attributes import set_committed_value
 
 from src.db import models
 from src.schemas.contacts import ContactCreate
 
 
-async def get_contact(db: Session, user: models.User, contact_id: int):
+def _owned_by(user: models.User, *contacts: models.Contact) -> None:
+    """
+    The _owned_by function sets the owner of contacts that were loaded for the given user.
+    Every query here is scoped to the current user, so the owner never has to be fetched.
+
+    :param user: models.User: The user the contacts belong to
+    :param contacts: models.Contact: The contacts to attach the owner to
+    :return: None
+    :doc-author: Trelent"""
+    for contact in contacts:
+        set_committed_value(contact, "owner", user)
+
+
+async def get_contact(db: AsyncSession, user: models.User, contact_id: int):
     """
     The get_contact function returns a contact from the database.
 
-    :param db: Session: Access the database
+    :param db: AsyncSession: Access the database
     :param user: models.User: Get the user's id to filter the contacts
     :param contact_id: int: Filter the contacts by id
     :return: A contact object
     :doc-author: Trelent"""
-    return (
-        db.query(models.Contact)
-        .filter(
-            and_(models.Contact.id == contact_id, models.Contact.user_id == user.id)
-        )
-        .first()
+    contact = await db.get(
+        models.Contact, contact_id, options=[noload(models.Contact.owner)]
     )
+    if contact is None or contact.user_id != user.id:
+        return None
+    _owned_by(user, contact)
+    return contact
 
 
-async def get_contact_by_email(db: Session, user: models.User, email: EmailStr):
+async def get_contact_by_email(db: AsyncSession, user: models.User, email: EmailStr):
     """
     The get_contact_by_email function returns a contact by email.
 
-    :param db: Session: Pass in the database session
+    :param db: AsyncSession: Pass in the database session
     :param user: models.User: Ensure that the user is authenticated
     :param email: EmailStr: Validate the email address
     :return: The first contact in the database that matches the email address and user id
     :doc-author: Trelent"""
-    return (
-        db.query(models.Contact)
-        .filter(and_(models.Contact.email == email, models.Contact.user_id == user.id))
-        .first()
+    result = await db.execute(
+        select(models.Contact)
+        .options(noload(models.Contact.owner))
+        .where(and_(models.Contact.email == email, models.Contact.user_id == user.id))
     )
+    contact = result.scalar_one_or_none()
+    if contact is not None:
+        _owned_by(user, contact)
+    return contact
 
 
 async def get_contacts(
@@ -49,18 +69,21 @@ async def get_contacts(
         email: str | None,
         first_name: str | None,
         last_name: str | None,
-        db: Session,
+        db: AsyncSession,
 
 ):
     """
     The get_contacts function returns a list of contacts that match the search criteria.
         Args:
-            db (Session): The database session object.
+            db (AsyncSession): The database session object.
             email (str | None): The email address to search for in the database. If no value is provided, all contacts are returned.
             user (models.User): The user who owns the contact(s). This is used to ensure that only a single users' contacts are returned and not all users' contacts in the database table/collection/etc..
             first_name (str | None): A string containing part or all of a first name to be searched
+            last_name (str | None): A string containing part or all of a last name to be searched
+
+        The email, first_name and last_name filters can be combined.
 
-    :param db: Session: Pass in the database session
+    :param db: AsyncSession: Pass in the database session
     :param email: str | None: Filter the contacts by email
     :param user: models.User: Get the user id of the current logged-in user
     :param first_name: str | None: Filter the contacts by first name
@@ -70,35 +93,23 @@ async def get_contacts(
     :param : Pass in the database session to use for querying
     :return: A list of contacts
     :doc-author: Trelent"""
-    contacts = db.query(models.Contact).filter(models.Contact.user_id == user.id)
-
+    filters = [models.Contact.user_id == user.id]
     if email:
-        contacts = contacts.filter(
-            and_(
-                models.Contact.email.ilike(f"%{email}%"),
-                models.Contact.user_id == user.id,
-            )
-        )
-    elif first_name:
-        contacts = contacts.filter(
-            and_(
-                models.Contact.first_name.ilike(f"%{first_name}%"),
-                models.Contact.user_id == user.id,
-            )
-        )
-    elif last_name:
-        contacts = contacts.filter(
-            and_(
-                models.Contact.last_name.ilike(f"%{last_name}%"),
-                models.Contact.user_id == user.id,
-            )
-        )
-    contacts = contacts.offset(skip).limit(limit).all()
+        filters.append(models.Contact.email.ilike(f"%{email}%"))
+    if first_name:
+        filters.append(models.Contact.first_name.ilike(f"%{first_name}%"))
+    if last_name:
+        filters.append(models.Contact.last_name.ilike(f"%{last_name}%"))
+
+    contacts = select(models.Contact).options(noload(models.Contact.owner)).where(*filters)
+    result = await db.execute(contacts.offset(skip).limit(limit))
+    contacts = result.scalars().all()
+    _owned_by(user, *contacts)
     return contacts
 
 
 async def read_contacts_by_week_to_birthday(
-        db: Session,
+        db: AsyncSession,
         user: models.User,
         skip: int,
         limit: int,
@@ -106,93 +117,104 @@ async def read_contacts_by_week_to_birthday(
     """
     The read_contacts_by_week_to_birthday function returns a list of contacts whose birthdays are within the next week.
 
-    :param db: Session: Pass a database session to the function
+    :param db: AsyncSession: Pass a database session to the function
     :param user: models.User: Filter the contacts by user_id
     :param skip: int: Skip the first n contacts in the list
     :param limit: int: Limit the number of contacts that are returned
     :param : Get the contacts from a specific user
     :return: A list of contacts whose birthdays are in the next week
     :doc-author: Trelent"""
-    current_datetime = datetime.now().date()
-    delta = timedelta(days=7)
-    future_datetime = current_datetime + delta
-
-    contacts = db.query(models.Contact).filter(
-        models.Contact.user_id == user.id,
+    current_date = date.today()
+    future_date = current_date + timedelta(days=7)
+    start = current_date.month * 100 + current_date.day
+    end = future_date.month * 100 + future_date.day
+
+    birth_mmdd = models.month_day(models.Contact.birth_date)
+    if start <= end:
+        in_window = birth_mmdd.between(start, end)
+    else:
+        # the week wraps over New Year
+        in_window = or_(birth_mmdd >= start, birth_mmdd <= end)
+
+    result = await db.execute(
+        select(models.Contact)
+        .options(noload(models.Contact.owner))
+        .where(models.Contact.user_id == user.id, in_window)
+        .offset(skip)
+        .limit(limit)
     )
-
-    bd_list = list()
-
-    for contact in contacts:
-        bd = datetime(
-            year=current_datetime.year,
-            month=contact.birth_date.month,
-            day=contact.birth_date.day,
-        ).date()
-        if (future_datetime - bd) <= delta:
-            bd_list.append(contact)
-
-    return bd_list
+    contacts = result.scalars().all()
+    _owned_by(user, *contacts)
+    return contacts
 
 
-async def create_contact(user: models.User, contact: ContactCreate, db: Session):
+async def create_contact(user: models.User, contact: ContactCreate, db: AsyncSession):
     """
     The create_contact function creates a new contact in the database.
 
     :param user: models.User: Get the user's id
     :param contact: ContactCreate: Pass in the contact data that is being created
-    :param db: Session: Access the database
-    :return: A contact object
+    :param db: AsyncSession: Access the database
+    :return: A contact object, or None if the user already has a contact with this email
     :doc-author: Trelent"""
-    db_contact = models.Contact(
-        first_name=contact.first_name,
-        last_name=contact.last_name,
-        email=contact.email,
-        phone=contact.phone,
-        birth_date=contact.birth_date,
-        bio=contact.bio,
-        user_id=user.id,
+    result = await db.execute(
+        insert(models.Contact)
+        .values(**contact.model_dump(), user_id=user.id)
+        .on_conflict_do_nothing(index_elements=["user_id", "email"])
+        .returning(models.Contact)
     )
-    db.add(db_contact)
-    db.commit()
-    db.refresh(db_contact)
+    db_contact = result.scalar_one_or_none()
+    if db_contact is None:
+        return None
+    _owned_by(user, db_contact)
+    await db.commit()
     return db_contact
 
 
 async def update_contact(
-        db_contact, contact: ContactCreate, db: Session
+        db: AsyncSession, user: models.User, contact_id: int, contact: ContactCreate
 ) -> models.Contact | None:
     """
     The update_contact function updates a contact in the database.
-        Args:
-            db_contact (models.Contact): The contact to be updated in the database.
-            contact (ContactCreate): The new information for the existing Contact object, which will overwrite its old data.
-
-    :param db_contact: Pass the contact to be updated
-    :param contact: ContactCreate: Pass the contact object to the function
-    :param db: Session: Access the database
-    :return: The updated contact
+        Ownership is checked in the same UPDATE ... RETURNING statement,
+        so the contact does not have to be fetched first.
+
+    :param db: AsyncSession: Access the database
+    :param user: models.User: Only update a contact that belongs to this user
+    :param contact_id: int: Identify the contact to be updated
+    :param contact: ContactCreate: The new contact data
+    :return: The updated contact, or None if the user has no such contact
     :doc-author: Trelent"""
-    db_contact.first_name = contact.first_name
-    db_contact.last_name = contact.last_name
-    db_contact.email = contact.email
-    db_contact.phone = contact.phone
-    db_contact.birth_date = contact.birth_date
-    db_contact.bio = contact.bio
-    db.commit()
+    result = await db.execute(
+        update(models.Contact)
+        .where(models.Contact.id == contact_id, models.Contact.user_id == user.id)
+        .values(**contact.model_dump())
+        .returning(models.Contact)
+    )
+    db_contact = result.scalar_one_or_none()
+    if db_contact is None:
+        return None
+    _owned_by(user, db_contact)
+    await db.commit()
     return db_contact
 
 
-async def remove_contact(db_contact, db: Session):
+async def remove_contact(db: AsyncSession, user_id: int, contact_id: int) -> int | None:
     """
     The remove_contact function removes a contact from the database.
-        Args:
-            db_contact (Contact): The contact to be removed from the database.
-            db (Session): A session object for interacting with the database.
+        Ownership is checked in the same DELETE ... RETURNING statement.
 
-    :param db_contact: Pass in the contact we want to delete
-    :param db: Session: Pass the database session to the function
-    :return: A none, but the delete function returns a number of rows deleted
+    :param db: AsyncSession: Pass the database session to the function
+    :param user_id: int: Only remove a contact that belongs to the user with this id
+    :param contact_id: int: Identify the contact to be removed
+    :return: The id of the removed contact, or None if the user has no such contact
     :doc-author: Trelent"""
-    db.delete(db_contact)
-    db.commit()
+    result = await db.execute(
+        delete(models.Contact)
+        .where(models.Contact.id == contact_id, models.Contact.user_id == user_id)
+        .returning(models.Contact.id)
+    )
+    deleted_id = result.scalar_one_or_none()
+    if deleted_id is not None:
+        await db.commit()
+    return deleted_id
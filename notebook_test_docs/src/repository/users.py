@@ -1,86 +1,99 @@
-from libgravatar import Gravatar
+import logging
+
 from pydantic import EmailStr
-from sqlalchemy.orm import Session
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.db import models
+from src.db.database import redis_client
 from src.schemas.users import UserCreate
 
+logger = logging.getLogger(__name__)
+
 
-async def get_user_by_email(email: EmailStr, db: Session) -> models.User:
+async def get_user_by_email(email: EmailStr, db: AsyncSession) -> models.User:
     """
     The get_user_by_email function takes in an email address and a database session,
     and returns the user associated with that email address. If no such user exists,
     it will return None.
 
     :param email: EmailStr: Validate the email address
-    :param db: Session: Pass the database session to the function
+    :param db: AsyncSession: Pass the database session to the function
     :return: A user object if the email is found in the database
     :doc-author: Trelent"""
-    return db.query(models.User).filter(models.User.email == email).first()
+    result = await db.execute(select(models.User).where(models.User.email == email))
+    return result.scalar_one_or_none()
 
 
-async def create_user(body: UserCreate, db: Session) -> models.User:
+async def create_user(body: UserCreate, db: AsyncSession) -> models.User:
     """
     The create_user function creates a new user in the database.
 
     :param body: UserCreate: Pass the request body to the function
-    :param db: Session: Access the database
+    :param db: AsyncSession: Access the database
     :return: A user object
     :doc-author: Trelent"""
+    # libgravatar is only needed on signup, keep it out of the hot import path
+    from libgravatar import Gravatar
+
     avatar = None
     try:
         g = Gravatar(body.email)
         avatar = g.get_image()
-    except Exception as e:
-        print(e)
-    new_user = models.User(**body.model_dump(), avatar=avatar)
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    except Exception:
+        logger.exception("Could not get Gravatar image for %s", body.email)
+    result = await db.execute(
+        insert(models.User)
+        .values(**body.model_dump(), avatar=avatar)
+        .returning(models.User)
+    )
+    new_user = result.scalar_one()
+    await db.commit()
     return new_user
 
 
-async def confirmed_email(email: str, db: Session) -> None:
+async def confirmed_email(email: str, db: AsyncSession) -> None:
     """
     The confirmed_email function takes in an email and a database session,
     and sets the confirmed field of the user with that email to True.
 
 
     :param email: str: Get the email of the user
-    :param db: Session: Pass the database session to the function
+    :param db: AsyncSession: Pass the database session to the function
     :return: Nothing
     :doc-author: Trelent"""
     user = await get_user_by_email(email, db)
     user.confirmed = True
-    db.commit()
+    await db.commit()
+    await redis_client.delete(f"user:{email}")
 
 
-async def update_token(user: models.User, token: str | None, db: Session) -> models.User:
+async def update_token(user: models.User, token: str | None, db: AsyncSession) -> models.User:
     """
     The update_token function updates the refresh token for a user in the database.
 
     :param user: models.User: Specify the user that is being updated
     :param token: str | None: Pass in the token that is returned from the spotify api
-    :param db: Session: Pass the database session to the function
+    :param db: AsyncSession: Pass the database session to the function
     :return: None
     :doc-author: Trelent"""
     user.refresh_token = token
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await redis_client.delete(f"user:{user.email}")
     return user
 
 
-async def update_avatar(email, url: str, db: Session) -> models.User:
+async def update_avatar(email, url: str, db: AsyncSession) -> models.User:
     """
     The update_avatar function updates the avatar of a user in the database.
 
     :param email: Find the user in the database
     :param url: str: Specify the type of data that is being passed into the function
-    :param db: Session: Pass the database session to the function
+    :param db: AsyncSession: Pass the database session to the function
     :return: The updated user object
     :doc-author: Trelent"""
     user = await get_user_by_email(email, db)
     user.avatar = url
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await redis_client.delete(f"user:{email}")
     return user
@@ -12,15 +12,19 @@ from fastapi.security import (
     HTTPAuthorizationCredentials,
     HTTPBearer,
 )
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.conf.messages import ACCOUNT_EXISTS_EXCEPTION, EMAIL_NOT_CONFIRMED, INVALID_PASSWORD, INVALID_EMAIL
-from src.db.database import get_db
+from src.conf.config import get_settings
+from src.conf.messages import ACCOUNT_EXISTS_EXCEPTION, EMAIL_NOT_CONFIRMED, INVALID_PASSWORD, INVALID_EMAIL, \
+    INVALID_REFRESH_TOKEN, VERIFICATION_ERROR
+from src.db.database import get_db, redis_client
 from src.repository import users as depo_users
-from src.schemas.users import UserCreate, Token, RequestEmail, UserResponse
+from src.schemas.users import UserCreate, Token, RequestEmail, UserResponse, normalize_email
 from src.services.auth import auth_service
+from src.services.limiter import limiter
 from src.services.mail import send_email
 
+settings = get_settings()
 router = APIRouter(
     prefix="/auth",
     tags=[
@@ -28,6 +32,8 @@ router = APIRouter(
     ],
 )
 security = HTTPBearer()
+# verified against when the email is unknown, so a miss costs as much as a hit
+_DUMMY_HASH = auth_service.hash_password("dummy-password")
 
 
 @router.post(
@@ -37,7 +43,7 @@ async def signup(
         body: UserCreate,
         background_tasks: BackgroundTasks,
         request: Request,
-        db: Session = Depends(get_db),
+        db: AsyncSession = Depends(get_db),
 ):
     """
     The signup function creates a new user in the database.
@@ -45,7 +51,7 @@ async def signup(
     :param body: UserCreate: Get the user data from the request body
     :param background_tasks: BackgroundTasks: Add a task to the background queue
     :param request: Request: Get the base url of the application
-    :param db: Session: Get a database session
+    :param db: AsyncSession: Get a database session
     :param : Get the user's email from the database
     :return: A dictionary with the user object and a detail message
     :doc-author: Trelent"""
@@ -54,7 +60,7 @@ async def signup(
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT, detail=ACCOUNT_EXISTS_EXCEPTION
         )
-    body.password = auth_service.get_password_hash(body.password)
+    body.password = await auth_service.get_password_hash(body.password)
     new_user = await depo_users.create_user(body, db)
     background_tasks.add_task(send_email, new_user.email, request.base_url)
     return {
@@ -64,31 +70,42 @@ async def signup(
 
 
 @router.post("/login", response_model=Token)
+# every attempt costs a bcrypt verify, so attempts per client are capped
+@limiter.limit(settings.login_rate_limit)
 async def login(
-        body: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)
+        request: Request,
+        body: OAuth2PasswordRequestForm = Depends(),
+        db: AsyncSession = Depends(get_db),
 ):
     """
     The login function is used to authenticate a user.
+        The refresh token is committed before it is returned, since refresh_token
+        treats any token other than the stored one as reuse and revokes the session.
 
+    :param request: Request: Identify the client for the login rate limit
     :param body: OAuth2PasswordRequestForm: Get the username and password from the request body
-    :param db: Session: Access the database
+    :param db: AsyncSession: Access the database
     :return: An access token and a refresh token
     :doc-author: Trelent"""
-    user = await depo_users.get_user_by_email(body.username, db)
+    user = await depo_users.get_user_by_email(normalize_email(body.username), db)
+    # every failure path pays exactly one bcrypt verify, so timing does not tell them apart
     if user is None:
+        await auth_service.verify_password(body.password, _DUMMY_HASH)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail=INVALID_EMAIL
         )
-    if not user.confirmed:
+    if not await auth_service.verify_password(body.password, user.password):
         raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED, detail=EMAIL_NOT_CONFIRMED
+            status_code=status.HTTP_401_UNAUTHORIZED, detail=INVALID_PASSWORD
         )
-    if not auth_service.verify_password(body.password, user.password):
+    if not user.confirmed:
         raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED, detail=INVALID_PASSWORD
+            status_code=status.HTTP_401_UNAUTHORIZED, detail=EMAIL_NOT_CONFIRMED
         )
     # Generate JWT
-    access_token = await auth_service.create_access_token(data={"sub": user.email})
+    access_token = await auth_service.create_access_token(
+        data={"sub": user.email, "uid": user.id}
+    )
     refresh_token = await auth_service.create_refresh_token(data={"sub": user.email})
     await depo_users.update_token(user, refresh_token, db)
     return {
@@ -101,7 +118,7 @@ async def login(
 @router.get("/refresh_token", response_model=Token)
 async def refresh_token(
         credentials: HTTPAuthorizationCredentials = Security(security),
-        db: Session = Depends(get_db),
+        db: AsyncSession = Depends(get_db),
 ):
     """
     The refresh_token function is used to refresh the access token.
@@ -109,7 +126,7 @@ async def refresh_token(
         refresh_token pair.
 
     :param credentials: HTTPAuthorizationCredentials: Get the token from the request header
-    :param db: Session: Get the database session
+    :param db: AsyncSession: Get the database session
     :param : Get the user's email from the token
     :return: A dict with the token type, access_token and refresh_token
     :doc-author: Trelent"""
@@ -119,10 +136,12 @@ async def refresh_token(
     if user.refresh_token != token:
         await depo_users.update_token(user, None, db)
         raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token"
+            status_code=status.HTTP_401_UNAUTHORIZED, detail=INVALID_REFRESH_TOKEN
         )
 
-    access_token = await auth_service.create_access_token(data={"sub": email})
+    access_token = await auth_service.create_access_token(
+        data={"sub": email, "uid": user.id}
+    )
     refresh_token = await auth_service.create_refresh_token(data={"sub": email})
     await depo_users.update_token(user, refresh_token, db)
     return {
@@ -133,7 +152,7 @@ async def refresh_token(
 
 
 @router.get("/confirmed_email/{token}")
-async def confirmed_email(token: str, db: Session = Depends(get_db)):
+async def confirmed_email(token: str, db: AsyncSession = Depends(get_db)):
     """
     The confirmed_email function is used to confirm a user's email address.
         It takes in the token that was sent to the user's email and uses it to get their email address.
@@ -142,14 +161,14 @@ async def confirmed_email(token: str, db: Session = Depends(get_db)):
         If they haven't yet confirmed their account, then we update our database so that this particular users' &quot;confirmed&quot; field becomes True.
 
     :param token: str: Get the token from the url
-    :param db: Session: Get the database session
+    :param db: AsyncSession: Get the database session
     :return: A message that the email is already confirmed or a message that the email has been confirmed
     :doc-author: Trelent"""
     email = await auth_service.get_email_from_token(token)
     user = await depo_users.get_user_by_email(email, db)
     if user is None:
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST, detail="Verification error"
+            status_code=status.HTTP_400_BAD_REQUEST, detail=VERIFICATION_ERROR
         )
     if user.confirmed:
         return {"message": "Your email is already confirmed"}
@@ -162,7 +181,7 @@ async def request_email(
         body: RequestEmail,
         background_tasks: BackgroundTasks,
         request: Request,
-        db: Session = Depends(get_db),
+        db: AsyncSession = Depends(get_db),
 ):
     """
     The request_email function is used to send a confirmation email to the user.
@@ -172,16 +191,15 @@ async def request_email(
     :param body: RequestEmail: Get the email from the request body
     :param background_tasks: BackgroundTasks: Add a task to the background tasks queue
     :param request: Request: Get the base url of the server
-    :param db: Session: Get the database session
+    :param db: AsyncSession: Get the database session
     :param : Get the user's email and username from the database
     :return: A message to the user
     :doc-author: Trelent"""
     user = await depo_users.get_user_by_email(body.email, db)
 
-    if user.confirmed:
+    if user and user.confirmed:
         return {"message": "Your email is already confirmed"}
-    if user:
-        background_tasks.add_task(
-            send_email, user.email, user.username, request.base_url
-        )
+    # at most one confirmation email per address per minute
+    if user and await redis_client.set(f"confirm_email:{user.email}", 1, nx=True, ex=60):
+        background_tasks.add_task(send_email, user.email, request.base_url)
     return {"message": "Check your email for confirmation."}
@@ -1,3 +1,5 @@
+from datetime import datetime
+from hashlib import blake2b
 from typing import List, Annotated
 
 from fastapi import (
@@ -7,67 +9,132 @@ from fastapi import (
     status,
     Query,
     Path,
+    Request,
+    Response,
 )
-from sqlalchemy.orm import Session
+from fastapi.responses import ORJSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from src.conf.messages import CONTACT_EXISTS, NOT_FOUND
 from src.db.database import get_db
 from src.db.models import User
 from src.repository import contacts as depo_contacts
 from src.schemas.contacts import Contact, ContactCreate
-from src.services.auth import auth_service
+from src.services.auth import get_current_user, get_current_user_id
 
 router = APIRouter(prefix="/contacts", tags=["contacts"])
 
 
+def _contact_to_dict(contact) -> dict:
+    """
+    The _contact_to_dict function builds the Contact schema's JSON shape by hand.
+    Read routes return it in an ORJSONResponse, which skips response_model validation.
+
+    :param contact: models.Contact: The contact to serialize
+    :return: A dictionary ready for orjson
+    :doc-author: Trelent"""
+    birth_date = contact.birth_date
+    owner = contact.owner
+    return {
+        "email": contact.email,
+        "first_name": contact.first_name,
+        "last_name": contact.last_name,
+        "phone": contact.phone,
+        "birth_date": birth_date.date() if isinstance(birth_date, datetime) else birth_date,
+        "bio": contact.bio,
+        "id": contact.id,
+        "owner": {"email": owner.email, "id": owner.id, "avatar": owner.avatar},
+    }
+
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """
+    The _etag_matches function applies the weak comparison RFC 9110 asks for with If-None-Match.
+    The header may be * or a comma-separated list, and W/ prefixes are ignored on both sides.
+
+    :param if_none_match: str | None: The If-None-Match header, if sent
+    :param etag: str: The ETag of the current representation
+    :return: True if the client's copy is still current
+    :doc-author: Trelent"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(
+        tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(",")
+    )
+
+
+def _conditional_json(request: Request, content) -> Response:
+    """
+    The _conditional_json function serializes content and tags it with a weak ETag.
+    If the client already holds the same representation, an empty 304 is returned instead.
+
+    :param request: Request: Read the If-None-Match header
+    :param content: The JSON-ready content to send
+    :return: An ORJSONResponse, or a 304 response
+    :doc-author: Trelent"""
+    response = ORJSONResponse(content)
+    etag = f'W/"{blake2b(response.body, digest_size=12).hexdigest()}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
+    return response
+
+
 @router.post("", response_model=Contact, status_code=status.HTTP_201_CREATED)
 async def create_contact(
         contact: ContactCreate,
-        current_user: User = Depends(auth_service.get_current_user),
-        db: Session = Depends(get_db),
+        current_user: User = Depends(get_current_user),
+        db: AsyncSession = Depends(get_db),
 ):
     """
     The create_contact function creates a new contact in the database.
 
     :param contact: ContactCreate: Pass the contact data to the function
     :param current_user: User: Get the current user
-    :param db: Session: Get the database session
+    :param db: AsyncSession: Get the database session
     :param : Get the current user
     :return: A contact object
     :doc-author: Trelent"""
-    db_contact = await depo_contacts.get_contact_by_email(
-        db, user=current_user, email=contact.email
+    db_contact = await depo_contacts.create_contact(
+        user=current_user, db=db, contact=contact
     )
-    if db_contact:
+    if db_contact is None:
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST, detail="Email already registered"
+            status_code=status.HTTP_400_BAD_REQUEST, detail=CONTACT_EXISTS
         )
-    return await depo_contacts.create_contact(user=current_user, db=db, contact=contact)
+    return db_contact
 
 
 @router.get("", response_model=List[Contact])
 async def read_contacts(
+        request: Request,
         skip: int = 0,
         limit: int = Query(10, le=100),
         email: Annotated[str | None, Query(max_length=255)] = None,
         first_name: Annotated[str | None, Query(max_length=255)] = None,
         last_name: Annotated[str | None, Query(max_length=255)] = None,
-        db: Session = Depends(get_db),
-        current_user: User = Depends(auth_service.get_current_user),
+        db: AsyncSession = Depends(get_db),
+        current_user: User = Depends(get_current_user),
 ):
     """
     The read_contacts function is used to retrieve a list of contacts from the database.
 
+    :param request: Request: Check the client's ETag
     :param skip: int: Skip a number of records
     :param limit: int: Limit the number of contacts returned
     :param email: Annotated[str | None: Filter the contacts by email
     :param first_name: Annotated[str | None: Pass the first_name parameter to the function
     :param last_name: Annotated[str | None: Filter the contacts by last name
-    :param db: Session: Get the database session
+    :param db: AsyncSession: Get the database session
     :param current_user: User: Get the current user from the database
     :param : Get the contact id
     :return: A list of contacts
     :doc-author: Trelent"""
-    return await depo_contacts.get_contacts(
+    contacts = await depo_contacts.get_contacts(
         skip,
         limit,
         current_user,
@@ -76,42 +143,48 @@ async def read_contacts(
         last_name,
         db,
     )
+    return _conditional_json(request, [_contact_to_dict(contact) for contact in contacts])
 
 
 @router.get("/week_to_birthday", response_model=List[Contact])
 async def read_contacts_by_week_to_birthday(
+        request: Request,
         skip: int = 0,
         limit: int = Query(10, le=100),
-        current_user: User = Depends(auth_service.get_current_user),
-        db: Session = Depends(get_db),
+        current_user: User = Depends(get_current_user),
+        db: AsyncSession = Depends(get_db),
 ):
     """
     The read_contacts_by_week_to_birthday function returns a list of contacts that have birthdays within the next week.
 
+    :param request: Request: Check the client's ETag
     :param skip: int: Skip a number of records in the database
     :param limit: int: Limit the number of contacts returned
     :param current_user: User: Get the current user from the database
-    :param db: Session: Pass the database session to the function
+    :param db: AsyncSession: Pass the database session to the function
     :param : Get the current user
     :return: A list of contacts
     :doc-author: Trelent"""
-    return await depo_contacts.read_contacts_by_week_to_birthday(
+    contacts = await depo_contacts.read_contacts_by_week_to_birthday(
         db=db, skip=skip, limit=limit, user=current_user
     )
+    return _conditional_json(request, [_contact_to_dict(contact) for contact in contacts])
 
 
 @router.get("/{contact_id}", response_model=Contact)
 async def read_contact(
+        request: Request,
         contact_id: int = Path(ge=1),
-        db: Session = Depends(get_db),
-        current_user: User = Depends(auth_service.get_current_user),
+        db: AsyncSession = Depends(get_db),
+        current_user: User = Depends(get_current_user),
 ):
     """
     The read_contact function is used to read a single contact from the database.
     It takes in an integer ID, and returns a Contact object.
 
+    :param request: Request: Check the client's ETag
     :param contact_id: int: Get the contact id from the url
-    :param db: Session: Get a database session
+    :param db: AsyncSession: Get a database session
     :param current_user: User: Get the current user from the database
     :param : Get the contact id
     :return: A contact object
@@ -120,16 +193,16 @@ async def read_contact(
         db, user=current_user, contact_id=contact_id
     )
     if db_contact is None:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found")
-    return db_contact
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=NOT_FOUND)
+    return _conditional_json(request, _contact_to_dict(db_contact))
 
 
 @router.put("/{contact_id}", response_model=Contact)
 async def update_contact(
         contact: ContactCreate,
         contact_id: int = Path(ge=1),
-        current_user: User = Depends(auth_service.get_current_user),
-        db: Session = Depends(get_db),
+        current_user: User = Depends(get_current_user),
+        db: AsyncSession = Depends(get_db),
 ):
     """
     The update_contact function updates a contact in the database.
@@ -139,36 +212,35 @@ async def update_contact(
     :param contact: ContactCreate: Create a new contact
     :param contact_id: int: Identify the contact to be updated
     :param current_user: User: Get the current user
-    :param db: Session: Pass the database session to the function
+    :param db: AsyncSession: Pass the database session to the function
     :param : Get the contact id from the url
     :return: An updated contact
     :doc-author: Trelent"""
-    db_contact = await depo_contacts.get_contact(
-        db, user=current_user, contact_id=contact_id
+    db_contact = await depo_contacts.update_contact(
+        db, user=current_user, contact_id=contact_id, contact=contact
     )
     if db_contact is None:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found")
-    return await depo_contacts.update_contact(db_contact, contact, db)
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=NOT_FOUND)
+    return db_contact
 
 
 @router.delete("/{contact_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def remove_contact(
         contact_id: int = Path(ge=1),
-        db: Session = Depends(get_db),
-        current_user: User = Depends(auth_service.get_current_user),
+        db: AsyncSession = Depends(get_db),
+        current_user_id: int = Depends(get_current_user_id),
 ):
     """
     The remove_contact function removes a contact from the database.
 
     :param contact_id: int: Specify the id of the contact to be deleted
-    :param db: Session: Access the database
-    :param current_user: User: Get the current user
+    :param db: AsyncSession: Access the database
+    :param current_user_id: int: The id of the current user, read from the token
     :param : Get the contact id from the path
-    :return: A boolean value
+    :return: None
     :doc-author: Trelent"""
-    db_contact = await depo_contacts.get_contact(
-        db, contact_id=contact_id, user=current_user
+    deleted_id = await depo_contacts.remove_contact(
+        db, user_id=current_user_id, contact_id=contact_id
     )
-    if db_contact is None:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found")
-    return await depo_contacts.remove_contact(db_contact, db)
+    if deleted_id is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=NOT_FOUND)
@@ -3,21 +3,30 @@ from typing import Annotated
 import cloudinary
 import cloudinary.uploader
 from fastapi import APIRouter, Depends, UploadFile, File
-from sqlalchemy.orm import Session
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.conf.config import settings
+from src.conf.config import get_settings
 from src.db import models
 from src.db.database import get_db
 from src.repository import users as repository_users
 from src.schemas.users import User
-from src.services.auth import auth_service
+from src.services.auth import get_current_user
 
 router = APIRouter(prefix="/users", tags=["users"])
 
+settings = get_settings()
+cloudinary.config(
+    cloud_name=settings.cloudinary_name,
+    api_key=settings.cloudinary_api_key,
+    api_secret=settings.cloudinary_api_secret,
+    secure=True,
+)
+
 
 @router.get("/me", response_model=User)
 async def read_users_me(
-        current_user: Annotated[models.User, Depends(auth_service.get_current_user)]
+        current_user: Annotated[models.User, Depends(get_current_user)]
 ):
     """
     The read_users_me function returns the current user's information.
@@ -31,29 +40,27 @@ async def read_users_me(
 @router.patch("/avatar", response_model=User)
 async def update_avatar_user(
         file: UploadFile = File(),
-        current_user: models.User = Depends(auth_service.get_current_user),
-        db: Session = Depends(get_db),
+        current_user: models.User = Depends(get_current_user),
+        db: AsyncSession = Depends(get_db),
 ):
     """
     The update_avatar_user function updates the avatar of a user.
 
     :param file: UploadFile: Upload a file to the server
     :param current_user: models.User: Get the current user's information
-    :param db: Session: Get the database session
+    :param db: AsyncSession: Get the database session
     :param : Get the current user
     :return: The updated user
     :doc-author: Trelent"""
-    cloudinary.config(
-        cloud_name=settings.cloudinary_name,
-        api_key=settings.cloudinary_api_key,
-        api_secret=settings.cloudinary_api_secret,
-        secure=True,
-    )
-
-    r = cloudinary.uploader.upload(
+    # the upload is a blocking HTTPS call, keep it off the event loop;
+    # upload_large sends the spooled file in chunks instead of reading it whole
+    r = await run_in_threadpool(
+        cloudinary.uploader.upload_large,
         file.file,
+        chunk_size=6_000_000,
         public_id=f"notebook/{current_user.id}",
         overwrite=True,
+        resource_type="image",
     )
     src_url = cloudinary.CloudinaryImage(f"notebook/{current_user.id}").build_url(
         width=250, height=250, crop="fill", version=r.get("version")
@@ -1,12 +1,12 @@
 from datetime import date
 
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, ConfigDict
 
-from src.schemas.users import User
+from src.schemas.users import Email, User
 
 
 class ContactBase(BaseModel):
-    email: EmailStr
+    email: Email
     first_name: str
     last_name: str
     phone: str
@@ -22,5 +22,4 @@ class Contact(ContactBase):
     id: int
     owner: User
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
@@ -1,8 +1,33 @@
-from pydantic import BaseModel, EmailStr
+from typing import Annotated
+
+from pydantic import AfterValidator, BaseModel, ConfigDict, StringConstraints
+
+
+def normalize_email(email: str) -> str:
+    """
+    The normalize_email function lowercases the domain part of an email address.
+    Domains are case-insensitive, and EmailStr stored them lowercased, so addresses
+    differing only in domain case must compare equal in lookups and unique checks.
+
+    :param email: str: The email address as typed
+    :return: The address with its domain lowercased
+    :doc-author: Trelent"""
+    local, at, domain = email.rpartition("@")
+    if not at:
+        return email
+    return f"{local}@{domain.lower()}"
+
+
+# a plain pattern check is much cheaper than EmailStr's email-validator parsing
+Email = Annotated[
+    str,
+    StringConstraints(pattern=r"^[^@\s]+@[^@\s]+\.[^@\s]+$", max_length=254),
+    AfterValidator(normalize_email),
+]
 
 
 class UserBase(BaseModel):
-    email: EmailStr
+    email: Email
 
 
 class UserCreate(UserBase):
@@ -13,8 +38,7 @@ class User(UserBase):
     id: int
     avatar: str
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class UserResponse(BaseModel):
@@ -29,4 +53,4 @@ class Token(BaseModel):
 
 
 class RequestEmail(BaseModel):
-    email: EmailStr
+    email: Email
@@ -1,31 +1,103 @@
-import pickle
-from datetime import datetime, timedelta
+import asyncio
+import logging
+import random
+import time
 from typing import Optional
 
-import redis
+import bcrypt
+from cachetools import TTLCache
 from fastapi import HTTPException, status, Depends
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordBearer
-from jose import JWTError, jwt
-from passlib.context import CryptContext
-from sqlalchemy.orm import Session
+import jwt
+import orjson
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.conf.config import settings
-from src.db.database import get_db
+from src.conf.config import get_settings
+from src.conf.messages import COULD_NOT_VALIDATE_CREDENTIALS, INVALID_SCOPE, INVALID_EMAIL_TOKEN
+from src.db import models
+from src.db.database import get_db, redis_client
 from src.repository import users as repository_users
 
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# token lifetimes in seconds; iat and exp are encoded as integer NumericDates
+ACCESS_TOKEN_TTL = 24 * 60 * 60
+REFRESH_TOKEN_TTL = 7 * 24 * 60 * 60
+EMAIL_TOKEN_TTL = 24 * 60 * 60
+# base64url length of the signature segment of an HMAC-signed JWT
+HMAC_SIGNATURE_LENGTHS = {"HS256": 43, "HS384": 64, "HS512": 86}
+# cached users live this long plus up to a minute of jitter, so entries don't expire together
+USER_CACHE_TTL = 15 * 60
+
+
+def _credentials_exception() -> HTTPException:
+    """
+    The _credentials_exception function builds the 401 raised for an unusable access token.
+    A fresh instance is built per failure, since a shared one would keep growing its traceback.
+
+    :return: An HTTPException
+    :doc-author: Trelent
+    """
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail=COULD_NOT_VALIDATE_CREDENTIALS,
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+# what current_user is read for; the password hash and refresh token stay out of redis
+_CACHED_USER_FIELDS = ("id", "email", "avatar", "confirmed")
+
+
+def _user_to_bytes(user: models.User) -> bytes:
+    """
+    The _user_to_bytes function serializes the cached fields of a user to JSON.
+
+    :param user: models.User: The user to cache
+    :return: The serialized user
+    :doc-author: Trelent
+    """
+    return orjson.dumps({field: getattr(user, field) for field in _CACHED_USER_FIELDS})
+
+
+def _user_from_bytes(data: bytes) -> models.User | None:
+    """
+    The _user_from_bytes function rebuilds a detached user from its cached JSON.
+    Entries that are not JSON (pickled by earlier releases) are treated as a cache miss.
+
+    :param data: bytes: The serialized user
+    :return: A user object, or None if the entry cannot be read
+    :doc-author: Trelent
+    """
+    try:
+        return models.User(**orjson.loads(data))
+    except orjson.JSONDecodeError:
+        return None
+
 
 class Auth:
-    pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    BCRYPT_ROUNDS = settings.bcrypt_rounds
     SECRET_KEY = settings.secret_key
     ALGORITHM = settings.algorithm
+    # encoded once, so encode/decode skip converting the secret on every call
+    SIGNING_KEY = SECRET_KEY.encode()
+    ALGORITHMS = [ALGORITHM]
+    SIGNATURE_LENGTH = HMAC_SIGNATURE_LENGTHS.get(ALGORITHM)
     oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
-    redis = redis.Redis(host=settings.redis_host, port=settings.redis_port, db=0)
+    redis = redis_client
+    # successfully verified access and email tokens -> payload, so replays skip the HMAC check
+    token_cache = TTLCache(maxsize=10000, ttl=60)
+    # email -> serialized user of a lookup in progress, shared by concurrent cache misses
+    _inflight: dict[str, asyncio.Future] = {}
 
-    def verify_password(self, plain_password, hashed_password):
+    async def verify_password(self, plain_password, hashed_password):
         """
     The verify_password function takes a plain-text password and hashed
-    password as arguments. It then uses the pwd_context object to verify that the
+    password as arguments. It then uses bcrypt.checkpw to verify that the
     plain-text password matches the hashed one.
+    bcrypt is CPU bound, so it runs in the threadpool to keep the event loop free.
 
     :param self: Make the function a method of the user class
     :param plain_password: Pass in the password that is entered by the user
@@ -33,19 +105,34 @@ class Auth:
     :return: True or false depending on if the password is correct
     :doc-author: Trelent
     """
-        return self.pwd_context.verify(plain_password, hashed_password)
+        return await run_in_threadpool(
+            bcrypt.checkpw, plain_password.encode(), hashed_password.encode()
+        )
+
+    def hash_password(self, password: str) -> str:
+        """
+    The hash_password function hashes a password with bcrypt at the configured cost.
+    It blocks, so request handlers should use get_password_hash instead.
+
+    :param self: Represent the instance of the class
+    :param password: str: The plain-text password
+    :return: A password hash
+    :doc-author: Trelent
+    """
+        salt = bcrypt.gensalt(rounds=self.BCRYPT_ROUNDS)
+        return bcrypt.hashpw(password.encode(), salt).decode()
 
-    def get_password_hash(self, password: str):
+    async def get_password_hash(self, password: str):
         """
     The get_password_hash function takes a password as input and returns the hash of that password.
-    The hash is generated using the pwd_context object, which is an instance of Flask-Bcrypt's Bcrypt class.
+    The hash is generated by hash_password, which runs in the threadpool like verify_password.
 
     :param self: Represent the instance of the class
     :param password: str: Get the password from the user
     :return: A password hash
     :doc-author: Trelent
     """
-        return self.pwd_context.hash(password)
+        return await run_in_threadpool(self.hash_password, password)
 
     async def create_access_token(
             self, data: dict, expires_delta: Optional[float] = None
@@ -54,7 +141,7 @@ class Auth:
     The create_access_token function creates a new access token.
         Args:
             data (dict): A dictionary containing the claims to be encoded in the JWT.
-            expires_delta (Optional[float]): An optional timedelta of seconds for the token's expiration time.
+            expires_delta (Optional[float]): An optional number of seconds for the token's expiration time.
 
     :param self: Represent the instance of the class
     :param data: dict: Pass the data that will be encoded in the jwt
@@ -63,15 +150,11 @@ class Auth:
     :doc-author: Trelent
     """
         to_encode = data.copy()
-        if expires_delta:
-            expire = datetime.utcnow() + timedelta(seconds=expires_delta)
-        else:
-            expire = datetime.utcnow() + timedelta(days=1)
-        to_encode.update(
-            {"iat": datetime.utcnow(), "exp": expire, "scope": "access_token"}
-        )
+        now = int(time.time())
+        expire = now + (int(expires_delta) if expires_delta else ACCESS_TOKEN_TTL)
+        to_encode.update({"iat": now, "exp": expire, "scope": "access_token"})
         encoded_access_token = jwt.encode(
-            to_encode, self.SECRET_KEY, algorithm=self.ALGORITHM
+            to_encode, self.SIGNING_KEY, algorithm=self.ALGORITHM
         )
         return encoded_access_token
 
@@ -91,15 +174,11 @@ class Auth:
     :doc-author: Trelent
     """
         to_encode = data.copy()
-        if expires_delta:
-            expire = datetime.utcnow() + timedelta(seconds=expires_delta)
-        else:
-            expire = datetime.utcnow() + timedelta(days=7)
-        to_encode.update(
-            {"iat": datetime.utcnow(), "exp": expire, "scope": "refresh_token"}
-        )
+        now = int(time.time())
+        expire = now + (int(expires_delta) if expires_delta else REFRESH_TOKEN_TTL)
+        to_encode.update({"iat": now, "exp": expire, "scope": "refresh_token"})
         encoded_refresh_token = jwt.encode(
-            to_encode, self.SECRET_KEY, algorithm=self.ALGORITHM
+            to_encode, self.SIGNING_KEY, algorithm=self.ALGORITHM
         )
         return encoded_refresh_token
 
@@ -116,23 +195,79 @@ class Auth:
     """
         try:
             payload = jwt.decode(
-                refresh_token, self.SECRET_KEY, algorithms=[self.ALGORITHM]
+                refresh_token, self.SIGNING_KEY, algorithms=self.ALGORITHMS
             )
             if payload["scope"] == "refresh_token":
                 email = payload["sub"]
                 return email
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid scope for token",
+                detail=INVALID_SCOPE,
             )
-        except JWTError:
+        except jwt.PyJWTError:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Could not validate credentials",
+                detail=COULD_NOT_VALIDATE_CREDENTIALS,
             )
 
+    def _is_malformed(self, token: str) -> bool:
+        """
+    The _is_malformed function cheaply rejects strings that cannot be a token we signed.
+        It checks for three segments, a header of sane size and, for HMAC algorithms,
+        a signature of the right length, so garbage never reaches the HMAC check.
+
+    :param self: Access the class attributes
+    :param token: str: The encoded JWT
+    :return: True if the token can be rejected without verifying it
+    :doc-author: Trelent
+    """
+        parts = token.split(".")
+        if len(parts) != 3 or len(parts[0]) > 256:
+            return True
+        return self.SIGNATURE_LENGTH is not None and len(parts[2]) != self.SIGNATURE_LENGTH
+
+    def decode_token(self, token: str) -> dict:
+        """
+    The decode_token function verifies a JWT and returns its payload.
+    Verified payloads are cached by the raw token for up to a minute, and a cached
+    payload is only reused while its exp claim is still in the future.
+    Tokens that fail verification are never cached, and malformed ones are rejected
+    before the signature is checked.
+    Access and email tokens go through it; callers check the scope themselves.
+
+    :param self: Access the class attributes
+    :param token: str: The encoded JWT
+    :return: The decoded payload
+    :doc-author: Trelent
+    """
+        payload = self.token_cache.get(token)
+        if payload is not None and payload["exp"] > time.time():
+            return payload
+        if self._is_malformed(token):
+            raise jwt.DecodeError("Malformed token")
+        payload = jwt.decode(token, self.SIGNING_KEY, algorithms=self.ALGORITHMS)
+        self.token_cache[token] = payload
+        return payload
+
+    def _access_payload(self, token: str) -> dict:
+        """
+    The _access_payload function decodes an access token and checks its scope and subject.
+
+    :param self: Access the class attributes
+    :param token: str: The access token from the authorization header
+    :return: The token payload
+    :doc-author: Trelent
+    """
+        try:
+            payload = self.decode_token(token)
+        except jwt.PyJWTError:
+            raise _credentials_exception()
+        if payload.get("scope") != "access_token" or payload.get("sub") is None:
+            raise _credentials_exception()
+        return payload
+
     async def get_current_user(
-            self, token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)
+            self, token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)
     ):
         """
     The get_current_user function is a dependency that will be used in the
@@ -141,43 +276,94 @@ class Auth:
 
     :param self: Access the class attributes
     :param token: str: Pass the token from the authorization header to this function
-    :param db: Session: Pass the database session to the function
+    :param db: AsyncSession: Pass the database session to the function
     :return: A user object
     :doc-author: Trelent
     """
-        credentials_exception = HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Could not validate credentials",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+        email = self._access_payload(token)["sub"]
+        cached = await self.redis.get(f"user:{email}")
+        user = _user_from_bytes(cached) if cached is not None else None
+        if user is None:
+            user = await self._load_user(email, db)
+            if user is None:
+                raise _credentials_exception()
+        return user
 
-        try:
+    async def _load_user(self, email: str, db: AsyncSession) -> models.User | None:
+        """
+    The _load_user function fetches a user after a cache miss and puts it back in redis.
+        Concurrent misses for the same email wait for the first one's lookup instead of
+        each querying the database, and get a detached copy of its result. If that lookup
+        fails, each of them raises its own RuntimeError chained to that exception rather
+        than retrying against a failing database; only if the first request is cancelled
+        does one waiter take the lookup over.
 
-            payload = jwt.decode(token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
-            if payload["scope"] == "access_token":
-                email = payload["sub"]
-                if email is None:
-                    raise credentials_exception
-            else:
-                raise credentials_exception
-        except JWTError:
-            raise credentials_exception
-        user = self.redis.get(f"user:{email}")
-        if user is None:
+    :param self: Access the class attributes
+    :param email: str: The email of the user to load
+    :param db: AsyncSession: Pass the database session to the function
+    :return: A user object, or None if there is no such user
+    :doc-author: Trelent
+    """
+        while (pending := self._inflight.get(email)) is not None:
+            try:
+                data = await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if pending.cancelled():
+                    continue
+                raise
+            except Exception as e:
+                # a fresh exception per waiter, so they don't all grow the leader's traceback
+                raise RuntimeError(f"Lookup of user {email} failed") from e
+            return _user_from_bytes(data) if data is not None else None
+
+        pending = self._inflight[email] = asyncio.get_running_loop().create_future()
+        try:
             user = await repository_users.get_user_by_email(email, db)
-            if user is None:
-                raise credentials_exception
-            self.redis.set(f"user:{email}", pickle.dumps(user))
-            self.redis.expire(f"user:{email}", 900)
+        except Exception as e:
+            pending.set_exception(e)
+            # mark it retrieved, so a lookup nobody waited for is not logged again
+            pending.exception()
+            raise
+        except BaseException:
+            pending.cancel()
+            raise
         else:
-            user = pickle.loads(user)
+            data = _user_to_bytes(user) if user is not None else None
+            pending.set_result(data)
+        finally:
+            del self._inflight[email]
+
+        if data is not None:
+            await self.redis.set(
+                f"user:{email}", data, ex=USER_CACHE_TTL + random.randint(0, 60)
+            )
         return user
 
+    async def get_current_user_id(
+            self, token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)
+    ) -> int:
+        """
+    The get_current_user_id function is a dependency for endpoints that only need the user's id.
+        The id is read from the token's uid claim, so no cache or database lookup is made.
+        Tokens issued without the claim fall back to get_current_user.
+
+    :param self: Access the class attributes
+    :param token: str: Pass the token from the authorization header to this function
+    :param db: AsyncSession: Pass the database session to the fallback lookup
+    :return: The id of the current user
+    :doc-author: Trelent
+    """
+        uid = self._access_payload(token).get("uid")
+        if uid is None:
+            user = await self.get_current_user(token, db)
+            return user.id
+        return uid
+
     def create_email_token(self, data: dict):
         """
     The create_email_token function takes a dictionary of data and returns a JWT token.
     The token is encoded with the SECRET_KEY and ALGORITHM defined in the class.
-    The iat (issued at) claim is set to datetime.utcnow() which represents when the token was created,
+    The iat (issued at) claim is set to the current Unix time which represents when the token was created,
     and exp (expiration time) claim is set to one day from now.
 
     :param self: Access the instance of a class
@@ -186,17 +372,17 @@ class Auth:
     :doc-author: Trelent
     """
         to_encode = data.copy()
-        expire = datetime.utcnow() + timedelta(days=1)
+        now = int(time.time())
         to_encode.update(
-            {"iat": datetime.utcnow(), "exp": expire, "scope": "email_token"}
+            {"iat": now, "exp": now + EMAIL_TOKEN_TTL, "scope": "email_token"}
         )
-        token = jwt.encode(to_encode, self.SECRET_KEY, algorithm=self.ALGORITHM)
+        token = jwt.encode(to_encode, self.SIGNING_KEY, algorithm=self.ALGORITHM)
         return token
 
     async def get_email_from_token(self, token: str):
         """
     The get_email_from_token function takes a token as an argument and returns the email address associated with that token.
-    The function first decodes the JWT using PyJWT's decode method, which returns a dictionary of payload data.
+    The function first decodes the JWT with decode_token, so a link opened twice is only verified once.
     If the scope is &quot;email_token&quot;, then we know this is an email verification token, so we return its subject (the user's email).
     Otherwise, if it isn't an email verification token or if there was some other error decoding it (like expired), then we raise HTTPException.
 
@@ -206,20 +392,23 @@ class Auth:
     :doc-author: Trelent
     """
         try:
-            payload = jwt.decode(token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
+            payload = self.decode_token(token)
             if payload["scope"] == "email_token":
                 email = payload["sub"]
                 return email
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid scope for token",
+                detail=INVALID_SCOPE,
             )
-        except JWTError as e:
-            print(e)
+        except jwt.PyJWTError as e:
+            logger.info("Invalid email verification token: %s", e)
             raise HTTPException(
                 status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-                detail="Invalid token for email verification",
+                detail=INVALID_EMAIL_TOKEN,
             )
 
 
 auth_service = Auth()
+# bound once, so routes depend on the same callables
+get_current_user = auth_service.get_current_user
+get_current_user_id = auth_service.get_current_user_id
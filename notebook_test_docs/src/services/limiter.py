@@ -0,0 +1,13 @@
+from slowapi import Limiter
+from slowapi.util import get_remote_address
+
+from src.conf.config import get_settings
+
+settings = get_settings()
+
+# memory:// keeps counters per process; several workers need a shared redis:// storage
+limiter = Limiter(
+    key_func=get_remote_address,
+    storage_uri=settings.rate_limit_storage_uri,
+    application_limits=["20/60seconds"],
+)
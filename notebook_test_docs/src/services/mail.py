@@ -1,12 +1,16 @@
+import logging
 from pathlib import Path
 
 from fastapi_mail import FastMail, MessageSchema, ConnectionConfig, MessageType
 from fastapi_mail.errors import ConnectionErrors
 from pydantic import EmailStr
 
-from src.conf.config import settings
+from src.conf.config import get_settings
 from src.services.auth import auth_service
 
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
 conf = ConnectionConfig(
     MAIL_USERNAME=settings.mail_username,
     MAIL_PASSWORD=settings.mail_password,
@@ -18,9 +22,14 @@ conf = ConnectionConfig(
     MAIL_SSL_TLS=False,
     USE_CREDENTIALS=True,
     VALIDATE_CERTS=False,
+    TIMEOUT=settings.mail_timeout,
     TEMPLATE_FOLDER=Path(__file__).parent / "templates",
 )
 
+# FastMail builds a fresh Jinja environment per templated send, so compile the template once
+fast_mail = FastMail(conf)
+email_template = conf.template_engine().get_template("email_template.html")
+
 
 async def send_email(email: EmailStr, host: str):
     """
@@ -39,15 +48,12 @@ The send_email function sends an email to the user's email address.
         message = MessageSchema(
             subject="Confirm your email ",
             recipients=[email],
-            template_body={
-                "host": host,
-                "email": email,
-                "token": token_verification,
-            },
+            body=email_template.render(
+                host=host, email=email, token=token_verification
+            ),
             subtype=MessageType.html,
         )
 
-        fm = FastMail(conf)
-        await fm.send_message(message, template_name="email_template.html")
-    except ConnectionErrors as err:
-        print(err)
+        await fast_mail.send_message(message)
+    except ConnectionErrors:
+        logger.exception("Could not send confirmation email to %s", email)
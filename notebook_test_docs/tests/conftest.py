@@ -1,24 +1,44 @@
+from unittest.mock import AsyncMock, patch
+
 import pytest
 from faker import Faker
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
 
 from main import app
 from src.db.database import get_db
 from src.db.models import Base
+from src.services.auth import Auth
+from src.services.limiter import limiter
 
 fake = Faker('en_UK')
 
 SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
+ASYNC_SQLALCHEMY_DATABASE_URL = "sqlite+aiosqlite:///./test.db"
 
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
 )
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# TestClient runs every request on its own event loop, so connections must not be pooled
+async_engine = create_async_engine(
+    ASYNC_SQLALCHEMY_DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    poolclass=NullPool,
+)
+AsyncTestingSessionLocal = async_sessionmaker(
+    async_engine, autoflush=False, expire_on_commit=False
+)
+
+# the minimum bcrypt cost, so hashing in tests does not dominate the run time
+Auth.BCRYPT_ROUNDS = 4
 
-@pytest.fixture(scope="module")
+
+@pytest.fixture(scope="session")
 def session():
     # Create the database
 
@@ -32,21 +52,26 @@ def session():
         db.close()
 
 
-@pytest.fixture(scope="module")
+@pytest.fixture(scope="session")
 def client(session):
     # Dependency override
 
-    def override_get_db():
-        try:
-            yield session
-        finally:
-            session.close()
+    async def override_get_db():
+        async with AsyncTestingSessionLocal() as db:
+            yield db
 
     app.dependency_overrides[get_db] = override_get_db
 
-    yield TestClient(app)
+    with patch("src.repository.users.redis_client", AsyncMock()):
+        yield TestClient(app)
 
 
-@pytest.fixture(scope="module")
+@pytest.fixture(scope="session")
 def user():
     return {"email": fake.email(), "password": fake.pystr()}
+
+
+@pytest.fixture(autouse=True)
+def reset_limiter():
+    # the whole session shares one client address, so give every test a fresh budget
+    limiter.reset()
@@ -0,0 +1,50 @@
+class FakeResult:
+    """
+    A stand-in for the Result of AsyncSession.execute that hands back one canned value.
+    """
+
+    def __init__(self, value=None):
+        self.value = value
+
+    def scalar_one(self):
+        return self.value
+
+    def scalar_one_or_none(self):
+        return self.value
+
+    def scalars(self):
+        return self
+
+    def all(self):
+        return self.value
+
+
+class FakeSession:
+    """
+    A stand-in for AsyncSession in the repository unit tests.
+
+    execute returns `result`, or, when `returning` is set to a model class, an instance
+    of it built from the statement's column values, like INSERT/UPDATE ... RETURNING.
+    get returns `get_result`. Executed statements and commits are recorded.
+    """
+
+    def __init__(self):
+        self.result = None
+        self.returning = None
+        self.get_result = None
+        self.statements = []
+        self.commits = 0
+
+    async def execute(self, statement):
+        self.statements.append(statement)
+        if self.returning is None:
+            return FakeResult(self.result)
+        columns = self.returning.__table__.columns
+        params = statement.compile().params
+        return FakeResult(self.returning(**{k: v for k, v in params.items() if k in columns}))
+
+    async def get(self, model, ident, **kwargs):
+        return self.get_result
+
+    async def commit(self):
+        self.commits += 1
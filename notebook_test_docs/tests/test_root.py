@@ -1,11 +1,4 @@
-from fastapi.testclient import TestClient
-
-from main import app
-
-client = TestClient(app)
-
-
-def test_root():
+def test_root(client):
     response = client.get('/')
     assert response.status_code == 200, response.text
     data = response.json()
@@ -1,9 +1,10 @@
-from unittest.mock import MagicMock
+from unittest.mock import AsyncMock, MagicMock
 
 import pytest
 
 from src.conf.messages import ACCOUNT_EXISTS_EXCEPTION, EMAIL_NOT_CONFIRMED, INVALID_PASSWORD, INVALID_EMAIL
 from src.db.models import User
+from src.services.limiter import limiter
 
 
 @pytest.mark.anyio
@@ -30,6 +31,15 @@ def test_repeat_create_user(client, user):
     assert data["detail"] == ACCOUNT_EXISTS_EXCEPTION
 
 
+def test_repeat_create_user_domain_case(client, user):
+    local, domain = user.get('email').split("@")
+    response = client.post(
+        "/api/auth/signup",
+        json={**user, "email": f"{local}@{domain.upper()}"},
+    )
+    assert response.status_code == 409, response.text
+
+
 def test_login_user_not_confirmed(client, user):
     response = client.post(
         "/api/auth/login",
@@ -40,6 +50,15 @@ def test_login_user_not_confirmed(client, user):
     assert data["detail"] == EMAIL_NOT_CONFIRMED
 
 
+def test_login_user_not_confirmed_wrong_password(client, user):
+    response = client.post(
+        "/api/auth/login",
+        data={"username": user.get('email'), "password": 'password'},
+    )
+    assert response.status_code == 401, response.text
+    assert response.json()["detail"] == INVALID_PASSWORD
+
+
 def test_login_user(client, session, user):
     current_user: User = session.query(User).filter(User.email == user.get('email')).first()
     current_user.confirmed = True
@@ -51,6 +70,17 @@ def test_login_user(client, session, user):
     assert response.status_code == 200, response.text
     data = response.json()
     assert data["token_type"] == "bearer"
+    session.refresh(current_user)
+    assert current_user.refresh_token == data["refresh_token"]
+
+
+def test_login_domain_case_insensitive(client, user):
+    local, domain = user.get('email').split("@")
+    response = client.post(
+        "/api/auth/login",
+        data={"username": f"{local}@{domain.upper()}", "password": user.get('password')},
+    )
+    assert response.status_code == 200, response.text
 
 
 def test_login_wrong_password(client, user):
@@ -71,3 +101,59 @@ def test_login_wrong_email(client, user):
     assert response.status_code == 401, response.text
     data = response.json()
     assert data["detail"] == INVALID_EMAIL
+
+
+def test_login_rate_limit(client, user):
+    limiter.reset()
+    for _ in range(5):
+        response = client.post(
+            "/api/auth/login",
+            data={"username": user.get('email'), "password": 'password'},
+        )
+        assert response.status_code == 401, response.text
+    response = client.post(
+        "/api/auth/login",
+        data={"username": user.get('email'), "password": 'password'},
+    )
+    assert response.status_code == 429, response.text
+    limiter.reset()
+
+
+def test_request_email_unknown_user(client, monkeypatch):
+    mock_send_email = AsyncMock()
+    monkeypatch.setattr("src.routes.auth.send_email", mock_send_email)
+    monkeypatch.setattr("src.routes.auth.redis_client", AsyncMock())
+    response = client.post("/api/auth/request_email", json={"email": "nobody@example.com"})
+    assert response.status_code == 200, response.text
+    assert response.json()["message"] == "Check your email for confirmation."
+    mock_send_email.assert_not_called()
+
+
+def test_request_email_confirmed_user(client, session, monkeypatch):
+    session.add(User(email="confirmed@example.com", password="password", confirmed=True))
+    session.commit()
+    mock_send_email = AsyncMock()
+    monkeypatch.setattr("src.routes.auth.send_email", mock_send_email)
+    monkeypatch.setattr("src.routes.auth.redis_client", AsyncMock())
+    response = client.post("/api/auth/request_email", json={"email": "confirmed@example.com"})
+    assert response.status_code == 200, response.text
+    assert response.json()["message"] == "Your email is already confirmed"
+    mock_send_email.assert_not_called()
+
+
+def test_request_email_resend_throttled(client, session, monkeypatch):
+    session.add(User(email="pending@example.com", password="password", confirmed=False))
+    session.commit()
+    mock_send_email = AsyncMock()
+    monkeypatch.setattr("src.routes.auth.send_email", mock_send_email)
+    redis_client = AsyncMock()
+    # SET NX succeeds for the first request and finds the key for the second
+    redis_client.set.side_effect = [True, None]
+    monkeypatch.setattr("src.routes.auth.redis_client", redis_client)
+    for _ in range(2):
+        response = client.post("/api/auth/request_email", json={"email": "pending@example.com"})
+        assert response.status_code == 200, response.text
+        assert response.json()["message"] == "Check your email for confirmation."
+    mock_send_email.assert_called_once()
+    assert mock_send_email.call_args.args[0] == "pending@example.com"
+    redis_client.set.assert_awaited_with("confirm_email:pending@example.com", 1, nx=True, ex=60)
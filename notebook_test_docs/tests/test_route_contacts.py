@@ -0,0 +1,116 @@
+import asyncio
+from datetime import date, datetime
+from unittest.mock import AsyncMock
+
+import orjson
+import pytest
+
+from src.db.models import Contact as ContactModel, User
+from src.routes.contacts import _contact_to_dict, _etag_matches
+from src.schemas.contacts import Contact
+from src.services.auth import auth_service
+
+
+@pytest.fixture()
+def headers(session, monkeypatch):
+    monkeypatch.setattr(auth_service, "redis", AsyncMock(get=AsyncMock(return_value=None)))
+    owner = session.query(User).filter(User.email == "etag@example.com").first()
+    if owner is None:
+        owner = User(email="etag@example.com", password="password", avatar="https://example.com/a.png", confirmed=True)
+        session.add(owner)
+        session.commit()
+    token = asyncio.run(auth_service.create_access_token(data={"sub": owner.email, "uid": owner.id}))
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.mark.parametrize("birth_date", [date(1990, 5, 17), datetime(1990, 5, 17)])
+def test_contact_to_dict_matches_schema(birth_date):
+    owner = User(id=3, email="owner@example.com", avatar="https://example.com/a.png")
+    contact = ContactModel(
+        id=7,
+        first_name="Ann",
+        last_name="Lee",
+        email="ann@example.com",
+        phone="+380501234567",
+        birth_date=birth_date,
+        bio="bio",
+        user_id=owner.id,
+        owner=owner,
+    )
+    expected = Contact.model_validate(contact).model_dump(mode="json")
+    assert orjson.loads(orjson.dumps(_contact_to_dict(contact))) == expected
+
+
+@pytest.mark.parametrize(
+    "if_none_match, expected",
+    [
+        (None, False),
+        ('W/"abc"', True),
+        ('"abc"', True),
+        ("*", True),
+        ('"zzz", W/"abc"', True),
+        ('W/"zzz"', False),
+    ],
+)
+def test_etag_matches(if_none_match, expected):
+    assert _etag_matches(if_none_match, 'W/"abc"') is expected
+
+
+def test_read_contacts_not_modified(client, headers):
+    response = client.post(
+        "/api/contacts",
+        json={
+            "email": "bob@example.com",
+            "first_name": "Bob",
+            "last_name": "Lee",
+            "phone": "+380501234567",
+            "birth_date": "1990-05-17",
+            "bio": "bio",
+        },
+        headers=headers,
+    )
+    assert response.status_code == 201, response.text
+    response = client.get("/api/contacts", headers=headers)
+    assert response.status_code == 200, response.text
+    etag = response.headers["etag"]
+
+    response = client.get("/api/contacts", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 304, response.text
+    assert response.headers["etag"] == etag
+    assert response.content == b""
+
+    response = client.get("/api/contacts", headers={**headers, "If-None-Match": 'W/"stale"'})
+    assert response.status_code == 200, response.text
+
+
+def test_remove_contact(client, session, headers):
+    other = User(email="other@example.com", password="password", avatar="https://example.com/b.png", confirmed=True)
+    session.add(other)
+    session.commit()
+    theirs = ContactModel(first_name="Eve", last_name="Doe", email="eve@example.com", phone="1",
+                          birth_date=datetime(1990, 5, 17), bio="bio", user_id=other.id)
+    session.add(theirs)
+    session.commit()
+    response = client.post(
+        "/api/contacts",
+        json={
+            "email": "mine@example.com",
+            "first_name": "Mine",
+            "last_name": "Lee",
+            "phone": "+380501234567",
+            "birth_date": "1990-05-17",
+            "bio": "bio",
+        },
+        headers=headers,
+    )
+    assert response.status_code == 201, response.text
+    mine = response.json()["id"]
+
+    response = client.delete(f"/api/contacts/{theirs.id}", headers=headers)
+    assert response.status_code == 404, response.text
+    assert session.get(ContactModel, theirs.id) is not None
+
+    response = client.delete(f"/api/contacts/{mine}", headers=headers)
+    assert response.status_code == 204, response.text
+    response = client.delete(f"/api/contacts/{mine}", headers=headers)
+    assert response.status_code == 404, response.text
@@ -0,0 +1,19 @@
+import unittest
+
+from src.conf.config import Settings
+
+
+class TestSettings(unittest.TestCase):
+
+    def test_empty_uvicorn_workers_is_unset(self):
+        self.assertIsNone(Settings(_env_file=None, uvicorn_workers="").uvicorn_workers)
+
+    def test_uvicorn_workers(self):
+        self.assertEqual(Settings(_env_file=None, uvicorn_workers="3").uvicorn_workers, 3)
+
+    def test_rate_limit_storage_defaults_to_memory(self):
+        self.assertEqual(Settings(_env_file=None).rate_limit_storage_uri, "memory://")
+
+
+if __name__ == '__main__':
+    unittest.main()
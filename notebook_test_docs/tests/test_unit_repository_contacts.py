@@ -1,71 +1,92 @@
 import unittest
-from unittest.mock import MagicMock
+from datetime import date, datetime
+from unittest.mock import patch
 
 from faker import Faker
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 
+from src.db.database import Base
 from src.db.models import User, Contact
 from src.repository.contacts import get_contacts, create_contact, update_contact, get_contact, get_contact_by_email, \
     read_contacts_by_week_to_birthday, remove_contact
 from src.schemas.contacts import ContactCreate
+from tests.fakes import FakeSession
 
 fake = Faker('en_UK')
 
 
+def predicates(statement):
+    return {(clause.left.name, clause.right.value) for clause in statement.whereclause.clauses}
+
+
 class TestContacts(unittest.IsolatedAsyncioTestCase):
 
     def setUp(self):
-        self.session = MagicMock(spec=Session)
+        self.session = FakeSession()
         self.user = User(id=fake.random_digit(), email=fake.email(), password=fake.pystr(), avatar=fake.url(),
                          refresh_token=fake.pystr(max_chars=100),
                          confirmed=True)
 
     async def test_get_contact_found(self):
-        contact = Contact()
-        self.session.query().filter().first.return_value = contact
+        contact = Contact(user_id=self.user.id)
+        self.session.get_result = contact
         result = await get_contact(contact_id=1, user=self.user, db=self.session)
         self.assertEqual(result, contact)
 
     async def test_get_contact_not_found(self):
-        self.session.query().filter().first.return_value = None
+        self.session.get_result = None
+        result = await get_contact(contact_id=1, user=self.user, db=self.session)
+        self.assertIsNone(result)
+
+    async def test_get_contact_of_other_user(self):
+        self.session.get_result = Contact(user_id=self.user.id + 1)
         result = await get_contact(contact_id=1, user=self.user, db=self.session)
         self.assertIsNone(result)
 
     async def test_get_contact_by_email_found(self):
         contact_by_email = Contact()
-        self.session.query().filter().first.return_value = contact_by_email
+        self.session.result = contact_by_email
         result = await get_contact_by_email(db=self.session, user=self.user, email=fake.safe_email())
         self.assertEqual(result, contact_by_email)
 
     async def test_get_contact_by_email_not_found(self):
-        self.session.query().filter().first.return_value = None
+        self.session.result = None
         result = await get_contact_by_email(db=self.session, user=self.user, email=fake.safe_email())
         self.assertEqual(result, None)
 
     async def test_get_contacts_no_params(self):
         contacts_no_params = [Contact(), Contact(), Contact()]
-        self.session.query().filter().offset().limit().all.return_value = contacts_no_params
+        self.session.result = contacts_no_params
         result = await get_contacts(0, 10, self.user, None, None, None, self.session)
         self.assertEqual(result, contacts_no_params)
 
     async def test_get_contacts_by_email(self):
         contacts_by_email = [Contact(), Contact(), Contact()]
-        self.session.query().filter().filter().offset().limit().all.return_value = contacts_by_email
+        self.session.result = contacts_by_email
         result = await get_contacts(0, 10, self.user, fake.safe_email(), None, None, self.session)
         self.assertEqual(result, contacts_by_email)
 
     async def test_get_contacts_by_first_name(self):
         contacts_by_first_name = [Contact(), Contact(), Contact()]
-        self.session.query().filter().filter().offset().limit().all.return_value = contacts_by_first_name
+        self.session.result = contacts_by_first_name
         result = await get_contacts(0, 10, self.user, None, fake.first_name(), None, self.session)
         self.assertEqual(result, contacts_by_first_name)
 
     async def test_get_contacts_by_last_name(self):
         contacts_by_last_name = [Contact(), Contact(), Contact()]
-        self.session.query().filter().filter().offset().limit().all.return_value = contacts_by_last_name
+        self.session.result = contacts_by_last_name
         result = await get_contacts(0, 10, self.user, None, None, fake.last_name(), self.session)
         self.assertEqual(result, contacts_by_last_name)
 
+    async def test_get_contacts_by_all_params(self):
+        contacts_by_all_params = [Contact()]
+        self.session.result = contacts_by_all_params
+        result = await get_contacts(0, 10, self.user, fake.safe_email(), fake.first_name(), fake.last_name(),
+                                    self.session)
+        self.assertEqual(result, contacts_by_all_params)
+        statement = self.session.statements[-1]
+        self.assertEqual(len(statement.whereclause.clauses), 4)
+
     async def test_read_contacts_by_week_to_birthday(self):
         contacts_by_week_to_birthday = [Contact(), Contact(), Contact(
             first_name=fake.first_name(),
@@ -76,7 +97,7 @@ class TestContacts(unittest.IsolatedAsyncioTestCase):
             bio=fake.sentence(nb_words=10),
             user_id=self.user.id,
         )]
-        self.session.query().filter().offset().limit().all.return_value = contacts_by_week_to_birthday
+        self.session.result = contacts_by_week_to_birthday
         result = await read_contacts_by_week_to_birthday(self.session, self.user, 0, 10)
         if len(result) > 0:
             return self.assertEqual(result, contacts_by_week_to_birthday)
@@ -91,6 +112,7 @@ class TestContacts(unittest.IsolatedAsyncioTestCase):
             birth_date=fake.date(),
             bio=fake.sentence(nb_words=10)
         )
+        self.session.returning = Contact
         result = await create_contact(contact=body, user=self.user, db=self.session)
         self.assertTrue(hasattr(result, "id"))
         self.assertEqual(result.user_id, self.user.id)
@@ -100,6 +122,22 @@ class TestContacts(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(result.phone, body.phone)
         self.assertEqual(result.birth_date, body.birth_date)
         self.assertEqual(result.bio, body.bio)
+        self.assertEqual(result.owner, self.user)
+        self.assertEqual(self.session.commits, 1)
+
+    async def test_create_contact_duplicate_email(self):
+        body = ContactCreate(
+            email=fake.email(),
+            first_name=fake.first_name(),
+            last_name=fake.last_name(),
+            phone=fake.phone_number(),
+            birth_date=fake.date(),
+            bio=fake.sentence(nb_words=10)
+        )
+        self.session.result = None
+        result = await create_contact(contact=body, user=self.user, db=self.session)
+        self.assertIsNone(result)
+        self.assertEqual(self.session.commits, 0)
 
     async def test_update_contact(self):
         body = ContactCreate(
@@ -110,27 +148,90 @@ class TestContacts(unittest.IsolatedAsyncioTestCase):
             birth_date=fake.date(),
             bio=fake.sentence(nb_words=10)
         )
-        contact = Contact(email=fake.email(),
-                          first_name=fake.first_name(),
-                          last_name=fake.last_name(),
-                          phone=fake.phone_number(),
-                          birth_date=fake.date(),
-                          bio=fake.sentence(nb_words=10)
-                          )
-        self.session.commit.return_value = None
-        result = await update_contact(db_contact=contact, contact=body, db=self.session)
-        self.assertEqual(result, contact)
-        self.assertEqual(result.first_name, contact.first_name)
-        self.assertEqual(result.last_name, contact.last_name)
-        self.assertEqual(result.email, contact.email)
-        self.assertEqual(result.phone, contact.phone)
-        self.assertEqual(result.birth_date, contact.birth_date)
-        self.assertEqual(result.bio, contact.bio)
+        self.session.returning = Contact
+        result = await update_contact(db=self.session, user=self.user, contact_id=1, contact=body)
+        self.assertEqual(predicates(self.session.statements[-1]), {("id", 1), ("user_id", self.user.id)})
+        self.assertEqual(result.first_name, body.first_name)
+        self.assertEqual(result.last_name, body.last_name)
+        self.assertEqual(result.email, body.email)
+        self.assertEqual(result.phone, body.phone)
+        self.assertEqual(result.birth_date, body.birth_date)
+        self.assertEqual(result.bio, body.bio)
+        self.assertEqual(result.owner, self.user)
+        self.assertEqual(self.session.commits, 1)
+
+    async def test_update_contact_not_found(self):
+        body = ContactCreate(
+            email=fake.email(),
+            first_name=fake.first_name(),
+            last_name=fake.last_name(),
+            phone=fake.phone_number(),
+            birth_date=fake.date(),
+            bio=fake.sentence(nb_words=10)
+        )
+        self.session.result = None
+        result = await update_contact(db=self.session, user=self.user, contact_id=1, contact=body)
+        self.assertIsNone(result)
+        self.assertEqual(self.session.commits, 0)
 
     async def test_remove_contact(self):
-        contact_to_remove = Contact()
-        result = await remove_contact(db_contact=contact_to_remove, db=self.session)
+        self.session.result = 1
+        result = await remove_contact(db=self.session, user_id=self.user.id, contact_id=1)
+        self.assertEqual(predicates(self.session.statements[-1]), {("id", 1), ("user_id", self.user.id)})
+        self.assertEqual(result, 1)
+        self.assertEqual(self.session.commits, 1)
+
+    async def test_remove_contact_not_found(self):
+        self.session.result = None
+        result = await remove_contact(db=self.session, user_id=self.user.id, contact_id=1)
         self.assertIsNone(result)
+        self.assertEqual(self.session.commits, 0)
+
+
+
+class TestBirthdayWindow(unittest.IsolatedAsyncioTestCase):
+    """
+    Runs read_contacts_by_week_to_birthday against SQLite, so the MMDD window itself is exercised.
+    """
+
+    BIRTH_DATES = ["1980-05-09", "1990-05-10", "1985-05-17", "1975-05-18",
+                   "1970-12-27", "1992-12-28", "2000-12-31", "1988-01-04", "1995-01-05"]
+
+    async def asyncSetUp(self):
+        self.engine = create_async_engine("sqlite+aiosqlite://")
+        async with self.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        self.session = async_sessionmaker(self.engine, expire_on_commit=False)()
+        self.user = User(email=fake.email(), password=fake.pystr(), confirmed=True)
+        other = User(email=fake.email(), password=fake.pystr(), confirmed=True)
+        self.session.add_all([self.user, other])
+        await self.session.flush()
+        for owner in (self.user, other):
+            self.session.add_all(
+                Contact(first_name=fake.first_name(), last_name=fake.last_name(), email=f"{birth}@example.com",
+                        birth_date=datetime.fromisoformat(birth), user_id=owner.id)
+                for birth in self.BIRTH_DATES
+            )
+        await self.session.commit()
+
+    async def asyncTearDown(self):
+        await self.session.close()
+        await self.engine.dispose()
+
+    async def birthdays(self, today):
+        with patch("src.repository.contacts.date") as mock_date:
+            mock_date.today.return_value = today
+            result = await read_contacts_by_week_to_birthday(self.session, self.user, 0, 100)
+        return sorted(contact.birth_date.date().isoformat() for contact in result)
+
+    async def test_week_within_year(self):
+        self.assertEqual(await self.birthdays(date(2023, 5, 10)), ["1985-05-17", "1990-05-10"])
+
+    async def test_week_over_new_year(self):
+        self.assertEqual(
+            await self.birthdays(date(2023, 12, 28)),
+            ["1988-01-04", "1992-12-28", "2000-12-31"],
+        )
 
 
 if __name__ == '__main__':
@@ -1,12 +1,12 @@
 import unittest
-from unittest.mock import MagicMock
+from unittest.mock import AsyncMock, patch
 
 from faker import Faker
-from sqlalchemy.orm import Session
 
 from src.db.models import User
 from src.repository.users import get_user_by_email, create_user, update_token
 from src.schemas.users import UserCreate
+from tests.fakes import FakeSession
 
 fake = Faker('en_UK')
 
@@ -14,19 +14,19 @@ fake = Faker('en_UK')
 class TestContacts(unittest.IsolatedAsyncioTestCase):
 
     def setUp(self):
-        self.session = MagicMock(spec=Session)
+        self.session = FakeSession()
         self.user = User(id=fake.random_digit(), email=fake.email(), password=fake.pystr(), avatar=fake.url(),
                          refresh_token=fake.pystr(max_chars=100),
                          confirmed=True)
 
     async def test_get_user_by_email_found(self):
         user_by_email = User()
-        self.session.query().filter().first.return_value = user_by_email
+        self.session.result = user_by_email
         result = await get_user_by_email(db=self.session, email=user_by_email.email)
         self.assertEqual(result, user_by_email)
 
     async def test_get_user_by_email_not_found(self):
-        self.session.query().filter().first.return_value = None
+        self.session.result = None
         result = await get_user_by_email(email=fake.email(), db=self.session)
         self.assertIsNone(result)
 
@@ -35,6 +35,7 @@ class TestContacts(unittest.IsolatedAsyncioTestCase):
             email=fake.email(),
             password=fake.pystr()
         )
+        self.session.returning = User
         result = await create_user(body=body, db=self.session)
         self.assertTrue(hasattr(result, "id"))
         self.assertEqual(result.email, body.email)
@@ -45,8 +46,10 @@ class TestContacts(unittest.IsolatedAsyncioTestCase):
             email=fake.email(),
             password=fake.pystr()
         )
-        result = await update_token(user=user, token=fake.pystr(max_chars=100), db=self.session)
+        with patch("src.repository.users.redis_client", new_callable=AsyncMock) as redis_client:
+            result = await update_token(user=user, token=fake.pystr(max_chars=100), db=self.session)
         self.assertEqual(result.refresh_token, user.refresh_token)
+        redis_client.delete.assert_awaited_once_with(f"user:{user.email}")
 
 
 if __name__ == '__main__':
@@ -0,0 +1,29 @@
+import unittest
+
+from pydantic import ValidationError
+
+from src.schemas.contacts import ContactCreate
+from src.schemas.users import RequestEmail, UserCreate
+
+
+class TestEmail(unittest.TestCase):
+
+    def test_domain_is_lowercased(self):
+        user = UserCreate(email="Bob@EXAMPLE.com", password="secret")
+        self.assertEqual(user.email, "Bob@example.com")
+
+    def test_addresses_differing_in_domain_case_are_equal(self):
+        self.assertEqual(RequestEmail(email="bob@Example.COM").email, RequestEmail(email="bob@example.com").email)
+
+    def test_contact_email_is_normalized(self):
+        contact = ContactCreate(email="Ann@Mail.Example.org", first_name="Ann", last_name="Lee", phone="1",
+                                birth_date="1990-05-17", bio="bio")
+        self.assertEqual(contact.email, "Ann@mail.example.org")
+
+    def test_invalid_email_is_rejected(self):
+        with self.assertRaises(ValidationError):
+            RequestEmail(email="not-an-email")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,174 @@
+import asyncio
+import pickle
+import time
+import unittest
+from unittest.mock import AsyncMock, patch
+
+import jwt
+from cachetools import TTLCache
+from fastapi import HTTPException
+
+from src.db.models import User
+from src.services.auth import Auth, HMAC_SIGNATURE_LENGTHS, _user_from_bytes, _user_to_bytes
+
+GET_USER_BY_EMAIL = "src.repository.users.get_user_by_email"
+
+
+class TestCurrentUser(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.auth = Auth()
+        self.auth._inflight = {}
+        self.auth.token_cache = TTLCache(maxsize=100, ttl=60)
+        self.auth.redis = AsyncMock()
+        self.auth.redis.get.return_value = None
+        self.user = User(id=1, email="user@example.com", password="hash", avatar="https://example.com/a.png",
+                         confirmed=True)
+
+    async def token(self):
+        return await self.auth.create_access_token(data={"sub": self.user.email, "uid": self.user.id})
+
+    async def test_current_user_id_from_uid_claim(self):
+        token = await self.token()
+        with patch(GET_USER_BY_EMAIL, AsyncMock()) as get_user_by_email:
+            user_id = await self.auth.get_current_user_id(token, None)
+        self.assertEqual(user_id, self.user.id)
+        get_user_by_email.assert_not_awaited()
+        self.auth.redis.get.assert_not_awaited()
+
+    async def test_current_user_id_without_uid_claim(self):
+        token = await self.auth.create_access_token(data={"sub": self.user.email})
+        with patch(GET_USER_BY_EMAIL, AsyncMock(return_value=self.user)) as get_user_by_email:
+            user_id = await self.auth.get_current_user_id(token, None)
+        self.assertEqual(user_id, self.user.id)
+        get_user_by_email.assert_awaited_once()
+
+    async def test_current_user_id_rejects_refresh_token(self):
+        token = await self.auth.create_refresh_token(data={"sub": self.user.email, "uid": self.user.id})
+        with self.assertRaises(HTTPException) as error:
+            await self.auth.get_current_user_id(token, None)
+        self.assertEqual(error.exception.status_code, 401)
+
+    async def test_concurrent_misses_share_one_lookup(self):
+        async def lookup(email, db):
+            await asyncio.sleep(0)
+            return self.user
+
+        token = await self.token()
+        with patch(GET_USER_BY_EMAIL, AsyncMock(side_effect=lookup)) as get_user_by_email:
+            users = await asyncio.gather(*[self.auth.get_current_user(token, None) for _ in range(10)])
+        get_user_by_email.assert_awaited_once()
+        self.assertEqual({user.id for user in users}, {self.user.id})
+        self.auth.redis.set.assert_awaited_once()
+        self.assertEqual(self.auth._inflight, {})
+
+    async def test_failed_lookup_is_shared(self):
+        async def lookup(email, db):
+            await asyncio.sleep(0)
+            raise ConnectionError("database is down")
+
+        token = await self.token()
+        with patch(GET_USER_BY_EMAIL, AsyncMock(side_effect=lookup)) as get_user_by_email:
+            results = await asyncio.gather(*[self.auth.get_current_user(token, None) for _ in range(10)],
+                                           return_exceptions=True)
+        get_user_by_email.assert_awaited_once()
+        leader, *waiters = results
+        self.assertIsInstance(leader, ConnectionError)
+        self.assertTrue(all(isinstance(result, RuntimeError) for result in waiters))
+        self.assertTrue(all(result.__cause__ is leader for result in waiters))
+        self.assertEqual(len({id(result) for result in waiters}), len(waiters))
+        self.auth.redis.set.assert_not_awaited()
+        self.assertEqual(self.auth._inflight, {})
+
+    async def test_cancelled_lookup_is_taken_over(self):
+        calls = []
+
+        async def lookup(email, db):
+            calls.append(email)
+            if len(calls) == 1:
+                await asyncio.sleep(10)
+            return self.user
+
+        with patch(GET_USER_BY_EMAIL, AsyncMock(side_effect=lookup)):
+            leader = asyncio.create_task(self.auth._load_user(self.user.email, None))
+            await asyncio.sleep(0)
+            waiter = asyncio.create_task(self.auth._load_user(self.user.email, None))
+            await asyncio.sleep(0)
+            leader.cancel()
+            user = await waiter
+        self.assertEqual(user.id, self.user.id)
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(self.auth._inflight, {})
+
+
+class TestTokens(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.auth = Auth()
+        self.auth.token_cache = TTLCache(maxsize=100, ttl=60)
+
+    async def token(self):
+        return await self.auth.create_access_token(data={"sub": "user@example.com"})
+
+    async def test_valid_token_is_well_formed(self):
+        self.assertFalse(self.auth._is_malformed(await self.token()))
+
+    async def test_two_segments_are_malformed(self):
+        header, payload, _ = (await self.token()).split(".")
+        self.assertTrue(self.auth._is_malformed(f"{header}.{payload}"))
+
+    async def test_oversized_header_is_malformed(self):
+        _, payload, signature = (await self.token()).split(".")
+        self.assertTrue(self.auth._is_malformed(f"{'a' * 257}.{payload}.{signature}"))
+
+    async def test_truncated_signature_is_malformed(self):
+        self.assertTrue(self.auth._is_malformed((await self.token())[:-1]))
+
+    async def test_unknown_algorithm_skips_signature_length(self):
+        self.auth.SIGNATURE_LENGTH = HMAC_SIGNATURE_LENGTHS.get("RS256")
+        self.assertFalse(self.auth._is_malformed("header.payload.sig"))
+
+    async def test_malformed_token_is_not_verified(self):
+        with patch("jwt.decode") as decode:
+            with self.assertRaises(jwt.DecodeError):
+                self.auth.decode_token("not-a-token")
+        decode.assert_not_called()
+
+    async def test_cached_payload_is_reused_until_exp(self):
+        token = await self.token()
+        cached = {"sub": "cached@example.com", "exp": time.time() + 60, "scope": "access_token"}
+        self.auth.token_cache[token] = cached
+        self.assertIs(self.auth.decode_token(token), cached)
+
+    async def test_expired_cached_payload_is_verified_again(self):
+        token = await self.token()
+        self.auth.token_cache[token] = {"sub": "cached@example.com", "exp": time.time() - 1}
+        payload = self.auth.decode_token(token)
+        self.assertEqual(payload["sub"], "user@example.com")
+        self.assertIs(self.auth.token_cache[token], payload)
+
+    async def test_invalid_token_is_not_cached(self):
+        token = await self.token()
+        forged = token[:-2] + ("AA" if not token.endswith("AA") else "BB")
+        with self.assertRaises(jwt.PyJWTError):
+            self.auth.decode_token(forged)
+        self.assertNotIn(forged, self.auth.token_cache)
+
+
+class TestUserCache(unittest.TestCase):
+
+    def test_round_trip_leaves_out_secrets(self):
+        user = User(id=1, email="user@example.com", password="hash", avatar="https://example.com/a.png",
+                    refresh_token="refresh", confirmed=True)
+        cached = _user_from_bytes(_user_to_bytes(user))
+        self.assertEqual((cached.id, cached.email, cached.avatar, cached.confirmed),
+                         (user.id, user.email, user.avatar, user.confirmed))
+        self.assertIsNone(cached.password)
+        self.assertIsNone(cached.refresh_token)
+
+    def test_legacy_pickle_entry_is_a_miss(self):
+        self.assertIsNone(_user_from_bytes(pickle.dumps({"id": 1, "email": "user@example.com"})))
+
+
+if __name__ == '__main__':
+    unittest.main()